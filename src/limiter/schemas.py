@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from enum import Enum, unique
+
+
+@dataclass
+class BandwidthLimit:
+    global_rate: int = 0
+    peer_rate: int = 0
+
+
+@unique
+class Direction(Enum):
+
+    UPLOAD = "UPLOAD"
+    DOWNLOAD = "DOWNLOAD"
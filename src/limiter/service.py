@@ -0,0 +1,105 @@
+import threading
+
+from time import monotonic, sleep
+from typing import Dict, Union
+
+from src.limiter.schemas import BandwidthLimit, Direction
+
+
+class TokenBucket:
+
+    def __init__(self, rate: int = 0) -> None:
+        self.lock = threading.Lock()
+        self.rate: int = rate
+        self.tokens: float = float(rate)
+        self.updated_at: float = monotonic()
+
+    def set_rate(self, rate: int) -> None:
+        with self.lock:
+            self._refill()
+            self.rate = rate
+            self.tokens = min(self.tokens, float(rate))
+
+    def consume(self, amount: int) -> float:
+        # Retorna quanto tempo o chamador deve aguardar (o saldo pode ficar negativo)
+        with self.lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def _refill(self) -> None:
+        now = monotonic()
+        if self.rate > 0:
+            elapsed = now - self.updated_at
+            self.tokens = min(float(self.rate), self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+
+class BandwidthLimiter:
+
+    MIN_SLICE = 1024
+    MAX_SLICE = 64 * 1024
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.limits: Dict[Direction, BandwidthLimit] = {
+            direction: BandwidthLimit() for direction in Direction
+        }
+        self.global_buckets: Dict[Direction, TokenBucket] = {
+            direction: TokenBucket() for direction in Direction
+        }
+        self.peer_buckets: Dict[Direction, Dict[str, TokenBucket]] = {
+            direction: {} for direction in Direction
+        }
+
+    def set_limit(
+        self,
+        direction: Direction,
+        global_rate: Union[int, None] = None,
+        peer_rate: Union[int, None] = None
+    ) -> None:
+        with self.lock:
+            limit = self.limits[direction]
+            if global_rate is not None:
+                limit.global_rate = global_rate
+                self.global_buckets[direction].set_rate(global_rate)
+            if peer_rate is not None:
+                limit.peer_rate = peer_rate
+                for bucket in self.peer_buckets[direction].values():
+                    bucket.set_rate(peer_rate)
+
+    def get_limit(self, direction: Direction) -> BandwidthLimit:
+        return self.limits[direction]
+
+    def is_limited(self, direction: Direction) -> bool:
+        limit = self.limits[direction]
+        return limit.global_rate > 0 or limit.peer_rate > 0
+
+    def slice_size(self, direction: Direction, default: int) -> int:
+        # Fatias menores mantêm a taxa suave quando há limite configurado
+        if not self.is_limited(direction):
+            return default
+        limit = self.limits[direction]
+        rates = [rate for rate in (limit.global_rate, limit.peer_rate) if rate > 0]
+        return max(self.MIN_SLICE, min(self.MAX_SLICE, min(rates) // 10))
+
+    def throttle(self, direction: Direction, peer_address: str, amount: int) -> None:
+        if amount <= 0 or not self.is_limited(direction):
+            return
+        wait = self.global_buckets[direction].consume(amount)
+        wait = max(wait, self._get_peer_bucket(direction, peer_address).consume(amount))
+        if wait > 0:
+            sleep(wait)
+
+    def _get_peer_bucket(self, direction: Direction, peer_address: str) -> TokenBucket:
+        with self.lock:
+            buckets = self.peer_buckets[direction]
+            bucket = buckets.get(peer_address)
+            if not bucket:
+                bucket = TokenBucket(self.limits[direction].peer_rate)
+                buckets[peer_address] = bucket
+            return bucket
@@ -1,19 +1,106 @@
-import sys
+import argparse
 import threading
 
+from src.limiter.schemas import Direction
 from src.menu.service import MenuService
+from src.metrics.service import manage_metrics
+from src.profiler.service import manage_profiler
 from src.peer.service import PeerService
 
 
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"'{value}' deve ser maior ou igual a 1")
+    return number
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if not 0 < number < float("inf"):
+        raise argparse.ArgumentTypeError(f"'{value}' deve ser um número maior que 0")
+    return number
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="eachare")
+    parser.add_argument("address", help="Endereço do peer (ip:porta)")
+    parser.add_argument("peers_file_path", help="Arquivo de peers vizinhos")
+    parser.add_argument("shared_directory", help="Diretório compartilhado")
+    parser.add_argument(
+        "--share",
+        action="append",
+        default=[],
+        metavar="DIR",
+        help="Diretório compartilhado adicional (pode ser repetido)"
+    )
+    # Limites de banda em bytes/s (0 = sem limite)
+    parser.add_argument("--upload-limit", type=int, default=0)
+    parser.add_argument("--download-limit", type=int, default=0)
+    parser.add_argument("--peer-upload-limit", type=int, default=0)
+    parser.add_argument("--peer-download-limit", type=int, default=0)
+    # Inicialização rápida: snapshot de peers e sondagem em segundo plano
+    parser.add_argument("--fast-start", action="store_true")
+    parser.add_argument("--peers-snapshot", help="Arquivo de snapshot dos peers")
+    parser.add_argument("--probe-workers", type=positive_int, default=8)
+    # Orçamento de memória para arquivos mapeados (mmap) servidos no DL
+    parser.add_argument("--mmap-budget", type=int, default=256 * 1024 * 1024)
+    # Exposição de métricas no formato Prometheus
+    parser.add_argument("--metrics-address", help="Endpoint HTTP de métricas (ip:porta)")
+    parser.add_argument("--metrics-file", help="Arquivo para despejo periódico de métricas")
+    parser.add_argument("--metrics-interval", type=positive_float, default=15.0)
+    # Profiling por amostragem (e tracemalloc opcional) com relatórios no diretório informado
+    parser.add_argument("--profile", nargs="?", const="./profiling", metavar="DIR")
+    parser.add_argument("--profile-allocations", action="store_true")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     # Obtendo parâmetros
-    address = sys.argv[1]
-    peers_file_path = sys.argv[2]
-    shared_directory = sys.argv[3]
+    arguments = parse_arguments()
+    if arguments.profile:
+        manage_profiler.enable(arguments.profile, arguments.profile_allocations)
+
+    peer_service = PeerService(
+        arguments.address,
+        arguments.peers_file_path,
+        [arguments.shared_directory] + arguments.share
+    )
+    # O snapshot é salvo em toda saída; só é carregado no modo de inicialização rápida
+    peer_service.peers_snapshot_path = (
+        arguments.peers_snapshot or f"{arguments.peers_file_path}.snapshot.json"
+    )
+    if arguments.fast_start:
+        peer_service.load_peers_snapshot()
+    peer_service.change_mapping_budget(arguments.mmap_budget)
+    peer_service.change_bandwidth_limit(
+        Direction.UPLOAD,
+        global_rate=arguments.upload_limit,
+        peer_rate=arguments.peer_upload_limit
+    )
+    peer_service.change_bandwidth_limit(
+        Direction.DOWNLOAD,
+        global_rate=arguments.download_limit,
+        peer_rate=arguments.peer_download_limit
+    )
+    if arguments.metrics_address:
+        manage_metrics.start_server(arguments.metrics_address)
+    if arguments.metrics_file:
+        metrics_dump = manage_metrics.start_dump(arguments.metrics_file, arguments.metrics_interval)
 
-    peer_service = PeerService(address, peers_file_path, shared_directory)
     server_thread = threading.Thread(target=peer_service.start_server, daemon=True)
     server_thread.start()
 
     menu_service = MenuService(peer_service)
-    menu_service.main_menu()
\ No newline at end of file
+    if arguments.fast_start:
+        probe_thread = threading.Thread(
+            target=menu_service.commands.probe_peers,
+            args=(arguments.probe_workers,),
+            daemon=True
+        )
+        probe_thread.start()
+    menu_service.main_menu()
+    if arguments.metrics_file:
+        # Último despejo com os valores finais antes de encerrar
+        metrics_dump.set()
+        manage_metrics.dump(arguments.metrics_file)
\ No newline at end of file
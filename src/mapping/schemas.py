@@ -0,0 +1,15 @@
+import mmap
+
+from dataclasses import dataclass
+
+
+@dataclass
+class MappedFile:
+    path: str
+    size: int
+    inode: int
+    mtime_ns: int
+    mapping: mmap.mmap
+    view: memoryview
+    users: int = 0
+    evicted: bool = False
@@ -0,0 +1,129 @@
+import mmap
+import os
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+from src.mapping.schemas import MappedFile
+
+
+class MappedFileCache:
+
+    def __init__(self, budget: int) -> None:
+        self.lock = threading.Lock()
+        self.budget: int = budget
+        # Bytes mapeados no momento, incluindo entradas já removidas do cache
+        # que ainda estão em uso e só serão fechadas ao final do uso
+        self.used: int = 0
+        self.entries: OrderedDict[str, MappedFile] = OrderedDict()
+
+    @contextmanager
+    def open(self, file_path: str) -> Iterator[Union[memoryview, None]]:
+        # Entrega uma visão somente leitura do arquivo inteiro, compartilhada entre as threads.
+        # Fatias dessa visão devem ser liberadas antes do fim do bloco.
+        # Retorna None quando o arquivo não pode ser mapeado dentro do orçamento.
+        entry = self._acquire(file_path)
+        if not entry:
+            yield None
+            return
+        try:
+            yield entry.view
+        finally:
+            self._release(entry)
+
+    def change_budget(self, new_value: int) -> None:
+        with self.lock:
+            self.budget = new_value
+            self._shrink()
+
+    def clear(self) -> None:
+        with self.lock:
+            for file_path in list(self.entries.keys()):
+                self._evict(file_path)
+
+    def _acquire(self, file_path: str) -> Union[MappedFile, None]:
+        info = os.stat(file_path)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry and self._is_current(entry, info):
+                self.entries.move_to_end(file_path)
+                entry.users += 1
+                return entry
+            if entry:
+                self._evict(file_path)
+            if info.st_size == 0 or info.st_size > self.budget:
+                return None
+
+        # O mapeamento é criado fora do lock para não bloquear as demais threads.
+        # Os metadados vêm do descritor aberto, pois o arquivo pode ter sido
+        # substituído depois do stat acima
+        with open(file_path, "rb") as file:
+            info = os.fstat(file.fileno())
+            if info.st_size == 0 or info.st_size > self.budget:
+                return None
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            file.close()
+        entry = MappedFile(
+            path=file_path,
+            size=info.st_size,
+            inode=info.st_ino,
+            mtime_ns=info.st_mtime_ns,
+            mapping=mapping,
+            view=memoryview(mapping),
+            users=1
+        )
+
+        with self.lock:
+            existing = self.entries.get(file_path)
+            if existing and self._is_current(existing, info):
+                # Outra thread mapeou o mesmo arquivo primeiro
+                self._close(entry)
+                self.entries.move_to_end(file_path)
+                existing.users += 1
+                return existing
+            if existing:
+                self._evict(file_path)
+            if not self._shrink(reserve=entry.size):
+                # Nada mais pode ser liberado agora: o chamador lê o arquivo normalmente
+                self._close(entry)
+                return None
+            self.entries[file_path] = entry
+            self.used += entry.size
+        return entry
+
+    def _release(self, entry: MappedFile) -> None:
+        with self.lock:
+            entry.users -= 1
+            if entry.evicted and entry.users == 0:
+                self.used -= entry.size
+                self._close(entry)
+
+    def _shrink(self, reserve: int = 0) -> bool:
+        # Libera os mapeamentos ociosos menos usados recentemente até que
+        # reserve bytes caibam no orçamento; mapeamentos em uso não são liberados
+        for file_path in list(self.entries.keys()):
+            if self.used + reserve <= self.budget:
+                break
+            if self.entries[file_path].users == 0:
+                self._evict(file_path)
+        return self.used + reserve <= self.budget
+
+    def _evict(self, file_path: str) -> None:
+        entry = self.entries.pop(file_path)
+        entry.evicted = True
+        if entry.users == 0:
+            self.used -= entry.size
+            self._close(entry)
+
+    def _close(self, entry: MappedFile) -> None:
+        entry.view.release()
+        entry.mapping.close()
+
+    def _is_current(self, entry: MappedFile, info: os.stat_result) -> bool:
+        return (
+            entry.size == info.st_size and
+            entry.inode == info.st_ino and
+            entry.mtime_ns == info.st_mtime_ns
+        )
@@ -6,10 +6,13 @@ from concurrent.futures import ThreadPoolExecutor
 from typing import Union, List, Dict
 from time import time
 
+from src.limiter.schemas import BandwidthLimit, Direction
 from src.peer.service import PeerService
-from src.peer.schemas import Peer, SharedFile, MessageType
+from src.peer.schemas import Peer, SharedFile, RemoteCatalog, MessageType
 from src.peer.message import Message, MessageData
 from src.menu.constants import Constant
+from src.metrics.service import manage_metrics
+from src.profiler.service import manage_profiler
 from src.stats.service import manage_stats
 
 
@@ -17,6 +20,7 @@ class Command:
 
     def __init__(self, peer: PeerService) -> None:
         self.peer = peer
+        self.catalog: Dict[str, RemoteCatalog] = {}
 
     def list_peers(self) -> List[Peer]:
         return self.peer.known_peers
@@ -30,6 +34,14 @@ class Command:
             )
         self.peer.send_message(target, message)
 
+    def probe_peers(self, max_workers: int) -> None:
+        # Envia HELLO a todos os peers conhecidos em paralelo, limitado a max_workers
+        peers = list(self.list_peers())
+        if not peers:
+            return
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(peers))) as executor:
+            list(executor.map(self.send_hello, peers))
+
     def send_get_peers(self) -> None:
         responses = self._get_peers_responses(
             peers_list=self.list_peers(),
@@ -54,21 +66,47 @@ class Command:
         for peer in self.list_peers():
             if peer.status == "ONLINE":
                 online_peers.append(peer)
-        responses = self._get_peers_responses(
-            peers_list=online_peers,
-            message_type=MessageType.LS
-        )
+        # Atualiza o catálogo de cada peer a partir da última versão conhecida
+        for peer in online_peers:
+            cached = self.catalog.get(peer.address)
+            if not cached or not cached.legacy:
+                responses = self._get_peers_responses(
+                    peers_list=[peer],
+                    message_type=MessageType.LS_IF_CHANGED,
+                    args=f"{cached.version if cached else 0}"
+                )
+                if responses and responses[0].get("type") in ("LS_NOT_MODIFIED", "LS_DELTA", "LS_FULL"):
+                    self._update_catalog(peer.address, responses[0])
+                    continue
+                # Peer inalcançável: não vale uma segunda tentativa
+                if peer.status != "ONLINE":
+                    self.catalog.pop(peer.address, None)
+                    continue
+            # Peers que só conhecem o LS original recebem a listagem completa
+            responses = self._get_peers_responses(
+                peers_list=[peer],
+                message_type=MessageType.LS
+            )
+            if not responses:
+                self.catalog.pop(peer.address, None)
+                continue
+            files = {}
+            for file in self._prepare_ls_response_args(responses[0].get("args")):
+                files[file.name] = file.bytes_size
+            self.catalog[peer.address] = RemoteCatalog(version=0, files=files, legacy=True)
         files_mapping = {}
-        for response in responses:
-            response_files = self._prepare_ls_response_args(response.get("args"))
-            for file in response_files:
-                if file.name in files_mapping.keys():
-                    files_mapping[file.name]["owner"].append(response.get("sender"))
+        for peer in online_peers:
+            catalog = self.catalog.get(peer.address)
+            if not catalog:
+                continue
+            for name, bytes_size in catalog.files.items():
+                if name in files_mapping.keys():
+                    files_mapping[name]["owner"].append(peer.address)
                 else:
-                    files_mapping[file.name] = {
-                    "name": file.name,
-                    "bytes_size": file.bytes_size,
-                    "owner": [response.get("sender")]
+                    files_mapping[name] = {
+                    "name": name,
+                    "bytes_size": bytes_size,
+                    "owner": [peer.address]
                 }
         return [files_mapping[key] for key in files_mapping.keys()]
     
@@ -96,24 +134,32 @@ class Command:
             start_chunk: int, 
             end_chunk: int
         ):
-            for chunk_index in range(start_chunk, end_chunk):
-                chunk_start_time = time()
-                args = f"{file.name} {chunk_size} {chunk_index}"
-                response = self._get_peers_responses(
-                    peers_list=[peer],
-                    message_type=MessageType.DL,
-                    args=args,
-                    response_data_separation="blankspace"
-                )
+            remaining_chunks = end_chunk - start_chunk
+            try:
+                for chunk_index in range(start_chunk, end_chunk):
+                    chunk_start_time = time()
+                    args = f"{file.name} {chunk_size} {chunk_index}"
+                    response = self._get_peers_responses(
+                        peers_list=[peer],
+                        message_type=MessageType.DL,
+                        args=args,
+                        response_data_separation="blankspace"
+                    )
 
-                with lock:
-                    responses[str(chunk_index)] = response[0] if response else None
+                    with lock:
+                        responses[str(chunk_index)] = response[0] if response else None
 
-                chunk_end_time = time() - chunk_start_time
-                chunk_times[chunk_index] = chunk_end_time
+                    chunk_end_time = time() - chunk_start_time
+                    chunk_times[chunk_index] = chunk_end_time
+                    remaining_chunks -= 1
+                    manage_metrics.pending_chunks.dec()
+            finally:
+                # Chunks não baixados por causa de um erro deixam de ser pendentes
+                manage_metrics.pending_chunks.dec(amount=remaining_chunks)
 
         # Cria e inicia as threads para cada peer
         chunk_start = 0
+        manage_metrics.pending_chunks.inc(amount=total_chunks)
 
         with ThreadPoolExecutor(max_workers=len(peers)) as executor:
             futures = []
@@ -186,6 +232,18 @@ class Command:
     def change_chunk_size(self, new_value: int) -> None:
         self.peer.change_chunk_size(new_value)
 
+    def get_bandwidth_limit(self, direction: Direction) -> BandwidthLimit:
+        return self.peer.limiter.get_limit(direction)
+
+    def change_bandwidth_limit(self, direction: Direction, per_peer: bool, new_value: int) -> None:
+        if per_peer:
+            self.peer.change_bandwidth_limit(direction, peer_rate=new_value)
+        else:
+            self.peer.change_bandwidth_limit(direction, global_rate=new_value)
+
+    def write_profiling_report(self) -> Union[str, None]:
+        return manage_profiler.write_report(self.peer.address.replace(":", "-"))
+
     def send_bye(self) -> None:
         online_peers = []
         for peer in self.list_peers():
@@ -199,6 +257,10 @@ class Command:
                 target=peer.address
             )
             self.peer.send_message(peer, message)
+        try:
+            self.peer.save_peers_snapshot()
+        except OSError as error:
+            print(f"Não foi possível salvar o snapshot de peers: {error}")
         self.peer.server.close()
 
     def _send_message(
@@ -258,7 +320,7 @@ class Command:
         for arg in args:
             if arg == "":
                 break
-            splitted_arg = arg.split(":")
+            splitted_arg = arg.rsplit(":", 1)
             result.append(
                 SharedFile(
                     name=splitted_arg[0],
@@ -267,12 +329,39 @@ class Command:
             )
         return result
 
+    def _update_catalog(self, owner: str, response: Dict[str, any]) -> None:
+        version = int(response.get("header"))
+        cached = self.catalog.get(owner)
+        response_type = response.get("type")
+        if response_type == "LS_NOT_MODIFIED":
+            if cached:
+                cached.version = version
+            return
+        if response_type == "LS_FULL":
+            files = {}
+            for file in self._prepare_ls_response_args(response.get("args")):
+                files[file.name] = file.bytes_size
+            self.catalog[owner] = RemoteCatalog(version=version, files=files)
+            return
+        # LS_DELTA: aplica inclusões/alterações (+) e remoções (-)
+        files = dict(cached.files) if cached else {}
+        for arg in response.get("args"):
+            if arg == "":
+                break
+            if arg[0] == "-":
+                files.pop(arg[1:], None)
+                continue
+            for file in self._prepare_ls_response_args([arg[1:]]):
+                files[file.name] = file.bytes_size
+        self.catalog[owner] = RemoteCatalog(version=version, files=files)
+
     def _get_response_data(self, response: str, method: str) -> Dict[str, any]:
         splitted_response = response.split(" ")
         response_dict = {
             "sender": splitted_response[0],
             "sender_clock": splitted_response[1],
             "type": splitted_response[2],
+            "header": splitted_response[3].strip() if len(splitted_response) > 3 else "",
             "args": []
         }
         if len(splitted_response) > 4:
@@ -9,9 +9,20 @@ Escolha um comando:
         [4] Buscar arquivos
         [5] Exibir estatisticas
         [6] Alterar tamanho de chunk
+        [7] Alterar limites de banda
+        [8] Gerar relatorio de profiling
         [9] Sair
 -> """
 
+    BANDWIDTH_LIMITS="""
+Escolha o limite de banda:
+        [0] Voltar para o menu anterior
+        [1] Upload global
+        [2] Upload por peer
+        [3] Download global
+        [4] Download por peer
+-> """
+
     LIST_PEERS="""
 Lista de Peers:
         [0] Voltar para o menu anterior"""
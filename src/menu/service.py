@@ -1,3 +1,4 @@
+from src.limiter.schemas import Direction
 from src.menu.command import Command
 from src.menu.constants import Constant
 from src.peer.service import PeerService, SharedFile
@@ -14,6 +15,8 @@ class MenuService:
             4: self._ls,
             5: self._st,
             6: self._change_chunk_size,
+            7: self._change_bandwidth_limit,
+            8: self._profiling_report,
             9: self._exit
         }
 
@@ -119,6 +122,43 @@ class MenuService:
             self.commands.change_chunk_size(int(new_value))
             print(f"        Tamanho de chunk alterado: {new_value}")
 
+    def _change_bandwidth_limit(self) -> None:
+        limits = {
+            1: (Direction.UPLOAD, False),
+            2: (Direction.UPLOAD, True),
+            3: (Direction.DOWNLOAD, False),
+            4: (Direction.DOWNLOAD, True)
+        }
+        for direction in Direction:
+            limit = self.commands.get_bandwidth_limit(direction)
+            print(f"        {direction.value}: global {limit.global_rate} B/s | por peer {limit.peer_rate} B/s")
+        choice = new_value = ""
+        try:
+            choice = input(Constant.BANDWIDTH_LIMITS)
+            if not choice.isdigit() or int(choice) not in range(0, len(limits) + 1):
+                raise ValueError
+            if int(choice) == 0:
+                return
+            print("Digite novo limite em bytes/s (0 = sem limite):")
+            new_value = input("> ")
+            if not new_value.isdigit():
+                raise ValueError
+        except ValueError:
+            print(f"O valor '{new_value or choice}' não é uma opção válida!")
+        except Exception as error:
+            print(f"Erro: {error}")
+        else:
+            direction, per_peer = limits[int(choice)]
+            self.commands.change_bandwidth_limit(direction, per_peer, int(new_value))
+            print(f"        Limite de banda alterado: {new_value} B/s")
+
+    def _profiling_report(self) -> None:
+        report_path = self.commands.write_profiling_report()
+        if not report_path:
+            print("Profiling desativado. Inicie o peer com a opção --profile.")
+            return
+        print(f"        Relatorio de profiling salvo em {report_path}")
+
     def _exit(self) -> bool:
         try:
             self.commands.send_bye()
@@ -126,4 +166,7 @@ class MenuService:
             print(f"Um erro ocorreu: {error}")
             return False
         else:
+            report_path = self.commands.write_profiling_report()
+            if report_path:
+                print(f"        Relatorio de profiling salvo em {report_path}")
             return True
@@ -0,0 +1,261 @@
+import os
+import threading
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple, Union
+
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+
+    type: str = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> None:
+        self.lock = threading.Lock()
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}"
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        return []
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [
+            f'{label}="{self._escape(value)}"'
+            for label, value in zip(self.labels, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _escape(self, value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter(Metric):
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def _render_samples(self) -> List[str]:
+        with self.lock:
+            values = dict(self.values)
+        return [
+            f"{self.name}{self._format_labels(labels)} {value}"
+            for labels, value in values.items()
+        ]
+
+
+class Gauge(Metric):
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        callback: Union[Callable[[], float], None] = None
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self.lock:
+            self.values[label_values] = value
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set_callback(self, callback: Callable[[], float]) -> None:
+        self.callback = callback
+
+    def _render_samples(self) -> List[str]:
+        if self.callback:
+            return [f"{self.name} {self.callback()}"]
+        with self.lock:
+            values = dict(self.values)
+        return [
+            f"{self.name}{self._format_labels(labels)} {value}"
+            for labels, value in values.items()
+        ]
+
+
+class Histogram(Metric):
+
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        # Para cada conjunto de labels: contagem por bucket, soma e total
+        self.values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total, count = self.values.get(
+                label_values,
+                ([0] * len(self.buckets), 0.0, 0)
+            )
+            if index < len(counts):
+                counts[index] += 1
+            self.values[label_values] = (counts, total + value, count + 1)
+
+    def _render_samples(self) -> List[str]:
+        with self.lock:
+            values = {
+                labels: (list(counts), total, count)
+                for labels, (counts, total, count) in self.values.items()
+            }
+        lines = []
+        for labels, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = self._format_labels(labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = self._format_labels(labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(labels)} {count}")
+        return lines
+
+
+class ManageMetrics:
+
+    def __init__(self) -> None:
+        self.messages_received = Counter(
+            "eachare_messages_received_total",
+            "Mensagens recebidas por tipo",
+            ("type",)
+        )
+        self.messages_sent = Counter(
+            "eachare_messages_sent_total",
+            "Mensagens enviadas por tipo",
+            ("type",)
+        )
+        self.handler_latency = Histogram(
+            "eachare_handler_latency_seconds",
+            "Tempo de tratamento de mensagens recebidas por tipo",
+            ("type",)
+        )
+        self.bytes_received = Counter(
+            "eachare_bytes_received_total",
+            "Bytes recebidos pelos sockets"
+        )
+        self.bytes_sent = Counter(
+            "eachare_bytes_sent_total",
+            "Bytes enviados pelos sockets"
+        )
+        self.active_connections = Gauge(
+            "eachare_active_connections",
+            "Conexões abertas no momento",
+            ("direction",)
+        )
+        self.pending_chunks = Gauge(
+            "eachare_pending_chunks",
+            "Chunks aguardando download"
+        )
+        self.clock = Gauge(
+            "eachare_clock",
+            "Valor atual do relógio lógico"
+        )
+        self.known_peers = Gauge(
+            "eachare_known_peers",
+            "Peers conhecidos"
+        )
+        self.metrics: List[Metric] = [
+            self.messages_received,
+            self.messages_sent,
+            self.handler_latency,
+            self.bytes_received,
+            self.bytes_sent,
+            self.active_connections,
+            self.pending_chunks,
+            self.clock,
+            self.known_peers
+        ]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, file_path: str) -> None:
+        # Escrita atômica para que leitores nunca vejam um arquivo parcial
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(self.render())
+            file.close()
+        os.replace(temp_path, file_path)
+
+    def start_server(self, address: str) -> ThreadingHTTPServer:
+        ip, port = address.split(":")
+        render = self.render
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                content = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args) -> None:
+                return None
+
+        server = ThreadingHTTPServer((ip, int(port)), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def start_dump(self, file_path: str, interval: float) -> threading.Event:
+        stop = threading.Event()
+
+        def dump_periodically() -> None:
+            while not stop.wait(interval):
+                self.dump(file_path)
+
+        threading.Thread(target=dump_periodically, daemon=True).start()
+        return stop
+
+
+manage_metrics = ManageMetrics()
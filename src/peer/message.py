@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Union
 
 
 @dataclass
@@ -6,6 +7,7 @@ class MessageData:
     type: str
     content: str
     warning: str
+    payload: Union[bytes, None] = None
 
 
 @dataclass
@@ -16,11 +18,21 @@ class ResponseMessage:
 class Message:
 
     @staticmethod
-    def create(origin: str, clock: int, type: str, target: str, args: str = "") -> MessageData:
+    def create(
+        origin: str,
+        clock: int,
+        type: str,
+        target: str,
+        args: str = "",
+        payload: Union[bytes, None] = None
+    ) -> MessageData:
+        # Com payload, o conteúdo traz apenas o cabeçalho; o payload e a quebra
+        # de linha final são enviados em seguida, sem concatenar os bytes
         return MessageData(
             type=type,
-            content=f"{origin} {clock} {type} {args}\n",
-            warning=f"""Encaminhando mensagem "{origin} {clock} {type}" para {target}"""
+            content=f"{origin} {clock} {type} {args}" + ("\n" if payload is None else ""),
+            warning=f"""Encaminhando mensagem "{origin} {clock} {type}" para {target}""",
+            payload=payload
         )
 
     @staticmethod
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict, Set
 from enum import Enum, unique
 
 
@@ -15,11 +16,27 @@ class SharedFile:
     bytes_size: int
 
 
+@dataclass
+class RemoteCatalog:
+    version: int
+    files: Dict[str, int] = field(default_factory=dict)
+    # Peer que só conhece o LS original
+    legacy: bool = False
+
+
+@dataclass
+class CatalogDelta:
+    added: Dict[str, int] = field(default_factory=dict)
+    changed: Dict[str, int] = field(default_factory=dict)
+    removed: Set[str] = field(default_factory=set)
+
+
 @unique
 class MessageType(Enum):
 
     HELLO = "HELLO"
     GET_PEERS = "GET_PEERS"
     LS = "LS"
+    LS_IF_CHANGED = "LS_IF_CHANGED"
     DL = "DL"
     BYE = "BYE"
\ No newline at end of file
@@ -1,18 +1,33 @@
 import socket
 import threading
 import base64
+import json
 
-from os import listdir, stat, path
-from typing import Union, List, Dict, Tuple
+from collections import OrderedDict
+from dataclasses import asdict
+from os import lstat, makedirs, path, replace, scandir
+from stat import S_ISDIR, S_ISREG
+from time import monotonic, perf_counter, time_ns
+from typing import Iterator, Union, List, Dict, Set, Tuple
 import binascii
 
+from src.limiter.schemas import Direction
+from src.limiter.service import BandwidthLimiter
+from src.mapping.service import MappedFileCache
+from src.metrics.service import manage_metrics
+from src.profiler.service import manage_profiler
 from src.peer.message import MessageData, Message
-from src.peer.schemas import Peer, SharedFile
+from src.peer.schemas import CatalogDelta, Peer, SharedFile
 
 
 class PeerService:
 
-    def __init__(self, address: str, peers_file_path: str, shared_directory: str) -> None:
+    def __init__(
+        self,
+        address: str,
+        peers_file_path: str,
+        shared_directory: Union[str, List[str]]
+    ) -> None:
         self.status = {
         True: "ONLINE",
         False: "OFFLINE"
@@ -21,15 +36,36 @@ class PeerService:
             "HELLO": self._handle_hello,
             "GET_PEERS": self._handle_get_peers,
             "LS": self._handle_ls,
+            "LS_IF_CHANGED": self._handle_ls_if_changed,
             "DL": self._handle_dl,
             "BYE": self._handle_bye
         }
         self.clock: int = 0
         self.address: str = address
         self.chunk: int = 256
+        self.limiter = BandwidthLimiter()
+        self.mapped_files = MappedFileCache(budget=256 * 1024 * 1024)
         self.peers_file_path: str = peers_file_path
-        self.shared_directory: str = shared_directory if shared_directory[-1] != "/" else shared_directory[:-1]
+        if isinstance(shared_directory, str):
+            shared_directory = [shared_directory]
+        # O primeiro diretório recebe os downloads; nomes repetidos valem pelo primeiro
+        self.shared_directories: List[str] = [
+            directory if directory[-1] != "/" else directory[:-1]
+            for directory in shared_directory
+        ]
+        self.shared_directory: str = self.shared_directories[0]
         self.known_peers: List[Peer] = self.read_known_peers()
+        self.peers_snapshot_path: Union[str, None] = None
+        # Catálogo versionado: snapshot atual e as diferenças das últimas versões
+        self.files_lock = threading.Lock()
+        self.files_version: int = time_ns() // 1_000_000
+        self.files_snapshot: Union[Dict[str, int], None] = None
+        self.files_deltas_size: int = 16
+        self.files_deltas: OrderedDict[int, CatalogDelta] = OrderedDict()
+        self.files_refresh_interval: float = 2.0
+        self.files_scanned_at: float = 0.0
+        manage_metrics.clock.set_callback(lambda: self.clock)
+        manage_metrics.known_peers.set_callback(lambda: len(self.known_peers))
 
     def read_known_peers(self) -> List[Peer]:
         known_peers = []
@@ -43,6 +79,44 @@ class PeerService:
             file.close()
         return known_peers
     
+    def load_peers_snapshot(self) -> None:
+        # Restaura o último estado conhecido dos peers e do relógio
+        snapshot_path = self.peers_snapshot_path
+        if not snapshot_path or not path.exists(snapshot_path):
+            return
+        try:
+            with open(snapshot_path, "r") as file:
+                snapshot = json.load(file)
+                file.close()
+            saved_clock = int(snapshot.get("clock", 0))
+            saved_peers = [
+                (saved_peer["address"], saved_peer["status"], int(saved_peer.get("clock", 0)))
+                for saved_peer in snapshot.get("peers", [])
+            ]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+            # O snapshot é só um cache; se estiver corrompido, vale o arquivo de peers
+            print(f"Snapshot de peers ignorado ({snapshot_path}): {error!r}")
+            return
+        self.clock = max(self.clock, saved_clock)
+        for address, status, clock in saved_peers:
+            peer = self.get_peer(address)
+            if not peer:
+                continue
+            peer.status = status
+            peer.clock = max(peer.clock, clock)
+
+    def save_peers_snapshot(self) -> None:
+        if not self.peers_snapshot_path:
+            return
+        snapshot = {
+            "clock": self.clock,
+            "peers": [asdict(peer) for peer in self.known_peers]
+        }
+        with open(f"{self.peers_snapshot_path}.tmp", "w") as file:
+            json.dump(snapshot, file)
+            file.close()
+        replace(f"{self.peers_snapshot_path}.tmp", self.peers_snapshot_path)
+
     def insert_known_peer(self, new_peer: str, status: bool = True, current_clock: int = 0) -> None:
         target = self.get_peer(new_peer) 
         if not target:
@@ -75,6 +149,8 @@ class PeerService:
             handling.start()
 
     def send_message(self, target: Peer, message: MessageData) -> Union[str, None]:
+        manage_metrics.active_connections.inc("outbound")
+        start_time = perf_counter()
         try:
             target_ip, target_port = self._split_address(target.address)
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client:
@@ -82,8 +158,9 @@ class PeerService:
                 self._increment_clock()
                 Message.show_sent_warning(message)
                 client.connect((target_ip, target_port))
-                client.send(message.content.encode("utf-8"))
-                response = self._get_message_chunks(client)
+                self._send_data(client, message.content.encode("utf-8"), target.address)
+                manage_metrics.messages_sent.inc(message.type)
+                response = self._get_message_chunks(client, target.address)
                 client.close()
         except:
             self._set_peer_status(target, False)
@@ -91,6 +168,9 @@ class PeerService:
         else:
             if message.type != "BYE": self._set_peer_status(target, True)
             return response
+        finally:
+            manage_profiler.record_message(f"{message.type} (enviada)", perf_counter() - start_time)
+            manage_metrics.active_connections.dec("outbound")
 
     def get_peer(self, address: str) -> Union[Peer, None]:
         for peer in self.known_peers:
@@ -99,17 +179,109 @@ class PeerService:
         return None
 
     def list_files_stats(self) -> List[SharedFile]:
-        shared_files = []
-        for file in listdir(self.shared_directory):
-            file_bytes = stat(f"{self.shared_directory}/{file}").st_size
-            shared_files.append(SharedFile(
-                name=file,
-                bytes_size=file_bytes
-            ))
-        return shared_files
+        return list(self.iter_shared_files())
+
+    def iter_shared_files(self) -> Iterator[SharedFile]:
+        # Percorre os subdiretórios sob demanda com uma pilha explícita, em vez de
+        # chamadas recursivas, sem seguir links simbólicos e gerando nomes
+        # relativos separados por "/"
+        seen = set()
+        for root in self.shared_directories:
+            pending = [(root, "")]
+            while pending:
+                directory, prefix = pending.pop()
+                try:
+                    entries = scandir(directory)
+                except OSError:
+                    continue
+                with entries:
+                    for entry in entries:
+                        name = f"{prefix}{entry.name}"
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append((entry.path, f"{name}/"))
+                                continue
+                            if not entry.is_file(follow_symlinks=False):
+                                continue
+                            if name in seen or not self._is_shared_name(name):
+                                continue
+                            file_bytes = entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            continue
+                        seen.add(name)
+                        yield SharedFile(
+                            name=name,
+                            bytes_size=file_bytes
+                        )
+
+    def resolve_shared_file(self, file_name: str) -> Union[str, None]:
+        # Mesmas regras da listagem: links simbólicos e arquivos .part não são
+        # servidos, e um nome inválido no primeiro diretório passa para o próximo
+        if not self._is_shared_name(file_name):
+            return None
+        parts = file_name.split("/")
+        for root in self.shared_directories:
+            file_path = root
+            for index, part in enumerate(parts):
+                file_path = path.join(file_path, part)
+                try:
+                    mode = lstat(file_path).st_mode
+                except OSError:
+                    break
+                is_last = index == len(parts) - 1
+                if (is_last and not S_ISREG(mode)) or (not is_last and not S_ISDIR(mode)):
+                    break
+            else:
+                return file_path
+        return None
+
+    def refresh_files_catalog(self) -> int:
+        # Reaproveita a última varredura se ela for recente
+        with self.files_lock:
+            elapsed = monotonic() - self.files_scanned_at
+            if self.files_snapshot is not None and elapsed < self.files_refresh_interval:
+                return self.files_version
+        snapshot = {
+            file.name: int(file.bytes_size)
+            for file in self.iter_shared_files()
+        }
+        with self.files_lock:
+            self.files_scanned_at = monotonic()
+            if self.files_snapshot is None:
+                self.files_version += 1
+                self.files_snapshot = snapshot
+                return self.files_version
+            delta = CatalogDelta()
+            for name, bytes_size in snapshot.items():
+                previous_size = self.files_snapshot.get(name)
+                if previous_size is None:
+                    delta.added[name] = bytes_size
+                elif previous_size != bytes_size:
+                    delta.changed[name] = bytes_size
+            for name in self.files_snapshot.keys():
+                if name not in snapshot:
+                    delta.removed.add(name)
+            if delta.added or delta.changed or delta.removed:
+                self.files_version += 1
+                self.files_snapshot = snapshot
+                self.files_deltas[self.files_version] = delta
+                while len(self.files_deltas) > self.files_deltas_size:
+                    self.files_deltas.popitem(last=False)
+            return self.files_version
+
+    def invalidate_files_catalog(self) -> None:
+        with self.files_lock:
+            self.files_scanned_at = 0.0
 
     def save_shared_file(self, file_name: str, file_content: bytes) -> bool:
-        with open(f"{self.shared_directory}/{file_name}", "wb") as new_file:
+        # Grava em um arquivo temporário e substitui o original de uma vez, para
+        # não truncar um arquivo que esteja mapeado em memória
+        if not self._is_safe_name(file_name):
+            print(f"Nome de arquivo inválido: {file_name}")
+            return False
+        file_path = path.join(self.shared_directory, *file_name.split("/"))
+        makedirs(path.dirname(file_path), exist_ok=True)
+        with open(f"{file_path}.part", "wb") as new_file:
             try:
                 #decoded = base64.b64decode(file_content)
                 new_file.write(file_content)
@@ -122,49 +294,92 @@ class PeerService:
                 if padding:
                     file_content += b'=' * (4 - padding)
                 return self.save_shared_file(file_name, file_content)
+        replace(f"{file_path}.part", file_path)
+        self.invalidate_files_catalog()
         return True
     
     def change_chunk_size(self, new_value: int) -> None:
         self.chunk = new_value
 
-    def _get_message_chunks(self, client: socket.socket) -> str:
-        response = ""
+    def change_mapping_budget(self, new_value: int) -> None:
+        self.mapped_files.change_budget(new_value)
+
+    def change_bandwidth_limit(
+        self,
+        direction: Direction,
+        global_rate: Union[int, None] = None,
+        peer_rate: Union[int, None] = None
+    ) -> None:
+        self.limiter.set_limit(direction, global_rate, peer_rate)
+
+    def _send_data(self, client: socket.socket, data: bytes, peer_address: str) -> None:
+        view = memoryview(data)
+        size = self.limiter.slice_size(Direction.UPLOAD, max(1, len(view)))
+        for start in range(0, len(view), size):
+            piece = view[start:start + size]
+            self.limiter.throttle(Direction.UPLOAD, peer_address, len(piece))
+            client.sendall(piece)
+            manage_metrics.bytes_sent.inc(amount=len(piece))
+
+    def _get_message_chunks(self, client: socket.socket, peer_address: str) -> str:
+        response = b""
         while True:
-            chunk = client.recv(self.chunk).decode("utf-8")
+            size = self.limiter.slice_size(Direction.DOWNLOAD, self.chunk)
+            chunk = client.recv(size)
             if not chunk:
                 break
+            self.limiter.throttle(Direction.DOWNLOAD, peer_address, len(chunk))
+            manage_metrics.bytes_received.inc(amount=len(chunk))
             response += chunk
-        return response
+        return response.decode("utf-8")
 
     def _handle_message(self, client: socket.socket) -> None:
-        message = client.recv(self.chunk).decode("utf-8")
-        Message.show_receive_warning(message)
-        splitted_message = message.replace("\n", "").split(" ")
-        sender = splitted_message[0]
-        sender_clock = int(splitted_message[1])
-        message_type = splitted_message[2]
-        args = None
-        if len(splitted_message) > 3:
-            args = splitted_message[3:]
-        self._set_max_clock_value(sender_clock)
-        self._increment_clock()
-        self.insert_known_peer(
-            new_peer=sender,
-            current_clock=sender_clock
-        )
-        response_content = self.handle_type.get(message_type)(sender, args)
-        if response_content:
+        manage_metrics.active_connections.inc("inbound")
+        try:
+            message = client.recv(self.chunk)
+            manage_metrics.bytes_received.inc(amount=len(message))
+            start_time = perf_counter()
+            message = message.decode("utf-8")
+            Message.show_receive_warning(message)
+            splitted_message = message.replace("\n", "").split(" ")
+            sender = splitted_message[0]
+            sender_clock = int(splitted_message[1])
+            message_type = splitted_message[2]
+            # Tipos desconhecidos vêm da rede e não podem criar séries novas
+            metric_type = message_type if message_type in self.handle_type else "unknown"
+            manage_metrics.messages_received.inc(metric_type)
+            args = None
+            if len(splitted_message) > 3:
+                args = splitted_message[3:]
+            self._set_max_clock_value(sender_clock)
             self._increment_clock()
-            response_message = Message.create(
-                origin=self.address,
-                target=sender,
-                clock=self.clock,
-                type=response_content.get("type"),
-                args=response_content.get("args", "")
+            self.insert_known_peer(
+                new_peer=sender,
+                current_clock=sender_clock
             )
-            Message.show_sent_warning(response_message)
-            client.send(response_message.content.encode("utf-8"))
-        client.close()
+            response_content = self.handle_type.get(message_type)(sender, args)
+            if response_content:
+                self._increment_clock()
+                response_message = Message.create(
+                    origin=self.address,
+                    target=sender,
+                    clock=self.clock,
+                    type=response_content.get("type"),
+                    args=response_content.get("args", ""),
+                    payload=response_content.get("payload")
+                )
+                Message.show_sent_warning(response_message)
+                self._send_data(client, response_message.content.encode("utf-8"), sender)
+                if response_message.payload is not None:
+                    self._send_data(client, response_message.payload, sender)
+                    self._send_data(client, b"\n", sender)
+                manage_metrics.messages_sent.inc(response_message.type)
+            elapsed = perf_counter() - start_time
+            manage_metrics.handler_latency.observe(elapsed, metric_type)
+            manage_profiler.record_message(f"{metric_type} (recebida)", elapsed)
+        finally:
+            client.close()
+            manage_metrics.active_connections.dec("inbound")
 
     def _handle_hello(self, *args) -> None:
         return None
@@ -184,21 +399,70 @@ class PeerService:
         }
     
     def _handle_ls(self, *args) -> Dict[str, str]:
-        files = self.list_files_stats()
-        args = f"{len(files)} "
-        for file in files:
-            args += f"{file.name}:{file.bytes_size}\n"
+        lines = [f"{file.name}:{file.bytes_size}\n" for file in self.iter_shared_files()]
+        args = f"{len(lines)} " + "".join(lines)
         return {
             "type": "LS_LIST",
             "args": args
         }
     
+    def _handle_ls_if_changed(self, sender: str, *args) -> Dict[str, str]:
+        known_version = 0
+        if args[0] and args[0][0].isdigit():
+            known_version = int(args[0][0])
+        self.refresh_files_catalog()
+        with self.files_lock:
+            # O snapshot é substituído, nunca alterado, então pode ser lido fora do lock
+            current_version = self.files_version
+            current_files = self.files_snapshot
+            changed_names = self._get_changed_files(known_version)
+        # Nada mudou desde a última consulta do peer
+        if known_version == current_version:
+            return {
+                "type": "LS_NOT_MODIFIED",
+                "args": f"{current_version}"
+            }
+        # Versão desconhecida (antiga demais ou de outra execução): lista completa
+        if changed_names is None:
+            args = f"{current_version} "
+            for name, bytes_size in current_files.items():
+                args += f"{name}:{bytes_size}\n"
+            return {
+                "type": "LS_FULL",
+                "args": args
+            }
+        # Envia apenas as diferenças acumuladas entre a versão conhecida e a atual
+        args = f"{current_version} "
+        for name in changed_names:
+            if name in current_files:
+                args += f"+{name}:{current_files[name]}\n"
+            else:
+                args += f"-{name}\n"
+        return {
+            "type": "LS_DELTA",
+            "args": args
+        }
+
+    def _get_changed_files(self, known_version: int) -> Union[Set[str], None]:
+        # Une as diferenças de known_version + 1 até a versão atual; None se
+        # alguma delas já foi descartada
+        if known_version >= self.files_version or known_version + 1 not in self.files_deltas:
+            return None
+        changed_names = set()
+        for version in range(known_version + 1, self.files_version + 1):
+            delta = self.files_deltas[version]
+            changed_names.update(delta.added.keys(), delta.changed.keys(), delta.removed)
+        return changed_names
+
     def _handle_dl(self, sender: str, *args) -> Union[Dict[str, any], None]:
         file_name = args[0][0]
         chunk_size = int(args[0][1])
         chunk_index = int(args[0][2])
 
-        file_path = f"{self.shared_directory}/{file_name}"
+        file_path = self.resolve_shared_file(file_name)
+        if not file_path:
+            print(f"Pedido de arquivo rejeitado: {file_name}")
+            return None
         file_size = path.getsize(file_path)
 
         start_pos = chunk_index * chunk_size
@@ -209,19 +473,26 @@ class PeerService:
             start_pos = file_size - aux
             end_pos = file_size
 
-        if start_pos >= end_pos:
+        if start_pos < 0 or start_pos >= end_pos:
             return None
 
-        with open(file_path, "rb") as file:
-            file.seek(start_pos)
-            content = file.read(min(chunk_size, file_size - start_pos))
-            content_string = base64.b64encode(content).decode("utf-8")
-            file.close()
+        end_pos = min(end_pos, file_size)
+        with self.mapped_files.open(file_path) as mapped_view:
+            if mapped_view is not None:
+                # Codifica direto da fatia mapeada, sem copiar o trecho do arquivo
+                with mapped_view[start_pos:end_pos] as content:
+                    payload = base64.b64encode(content)
+            else:
+                with open(file_path, "rb") as file:
+                    file.seek(start_pos)
+                    payload = base64.b64encode(file.read(end_pos - start_pos))
+                    file.close()
 
-        args = f"{file_name} {chunk_size} {chunk_index} {content_string}"
+        args = f"{file_name} {chunk_size} {chunk_index} "
         return {
             "type": "FILE",
-            "args": args
+            "args": args,
+            "payload": payload
         }
 
     def _handle_bye(self, sender: str, *args) -> None:
@@ -239,6 +510,17 @@ class PeerService:
         peer.status = self.status.get(status)
         Message.show_status_update(peer.address, self.status.get(status))
 
+    def _is_safe_name(self, file_name: str) -> bool:
+        # Nomes relativos, sem "..", sem barras invertidas e sem espaços, que separam os campos das mensagens
+        if not file_name or file_name.startswith("/") or "\\" in file_name:
+            return False
+        if any(character.isspace() or character == "\0" for character in file_name):
+            return False
+        return all(part not in ("", ".", "..") for part in file_name.split("/"))
+
+    def _is_shared_name(self, file_name: str) -> bool:
+        return self._is_safe_name(file_name) and not file_name.endswith(".part")
+
     def _split_address(self, address: str) -> Tuple:
         split = address.split(":")
         return split[0], int(split[1])
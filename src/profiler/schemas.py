@@ -0,0 +1,22 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Tuple
+
+
+FunctionKey = Tuple[str, int, str]
+
+
+@dataclass
+class MessageTiming:
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+
+@dataclass
+class ThreadSamples:
+    samples: int = 0
+    # Amostras em que a função estava executando (self) ou em qualquer ponto da pilha (total)
+    self_counts: Counter = field(default_factory=Counter)
+    total_counts: Counter = field(default_factory=Counter)
+    stacks: Counter = field(default_factory=Counter)
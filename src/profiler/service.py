@@ -0,0 +1,140 @@
+import io
+import os
+import re
+import sys
+import threading
+import tracemalloc
+
+from datetime import datetime
+from typing import Dict, List, Union
+
+from src.profiler.schemas import FunctionKey, MessageTiming, ThreadSamples
+
+
+class ManageProfiler:
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.output_directory: str = "."
+        self.interval: float = 0.005
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.threads: Dict[str, ThreadSamples] = {}
+        self.message_times: Dict[str, MessageTiming] = {}
+        self.baseline: Union[tracemalloc.Snapshot, None] = None
+
+    def enable(
+        self,
+        output_directory: str,
+        trace_allocations: bool = False,
+        interval: float = 0.005
+    ) -> None:
+        self.enabled = True
+        self.output_directory = output_directory
+        self.interval = interval
+        os.makedirs(output_directory, exist_ok=True)
+        # O tracemalloc deixa alocações bem mais lentas e distorce os tempos
+        # amostrados, por isso só é ligado quando pedido (com um único frame)
+        if trace_allocations:
+            tracemalloc.start(1)
+            self.baseline = tracemalloc.take_snapshot()
+        sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        sampler.start()
+
+    def record_message(self, message_type: str, elapsed: float) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            timing = self.message_times.setdefault(message_type, MessageTiming())
+            timing.count += 1
+            timing.total_time += elapsed
+            timing.max_time = max(timing.max_time, elapsed)
+
+    def write_report(self, name: str = "eachare") -> Union[str, None]:
+        if not self.enabled:
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base_path = os.path.join(self.output_directory, f"{name}-{timestamp}")
+        report = io.StringIO()
+
+        with self.lock:
+            message_times = dict(self.message_times)
+            threads = {
+                group: ThreadSamples(
+                    samples=samples.samples,
+                    self_counts=samples.self_counts.copy(),
+                    total_counts=samples.total_counts.copy(),
+                    stacks=samples.stacks.copy()
+                )
+                for group, samples in self.threads.items()
+            }
+
+        report.write("Tempo por tipo de mensagem\n")
+        report.write(f"{'Tipo':<28}|{'N':^9}|{'Total [s]':^12}|{'Media [s]':^12}|{'Max [s]':^12}\n")
+        for message_type, timing in sorted(message_times.items()):
+            average = timing.total_time / timing.count
+            report.write(f"{message_type:<28}|{timing.count:^9}|{timing.total_time:^12.5f}|{average:^12.5f}|{timing.max_time:^12.5f}\n")
+
+        report.write(f"\nAmostragem por thread (intervalo de {self.interval * 1000:.1f} ms)\n")
+        for group, samples in sorted(threads.items(), key=lambda item: -item[1].samples):
+            report.write(f"\n[{group}] {samples.samples} amostras (~{samples.samples * self.interval:.2f} s)\n")
+            report.write(f"{'Total %':>8} {'Self %':>8}  Função\n")
+            for function, total in samples.total_counts.most_common(25):
+                total_percent = 100 * total / samples.samples
+                self_percent = 100 * samples.self_counts[function] / samples.samples
+                report.write(f"{total_percent:>8.1f} {self_percent:>8.1f}  {self._format_function(function)}\n")
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            report.write("\nMaiores alocações atuais\n")
+            for stat in snapshot.statistics("lineno")[:25]:
+                report.write(f"{stat}\n")
+            report.write("\nMaiores crescimentos desde o início\n")
+            for stat in snapshot.compare_to(self.baseline, "lineno")[:25]:
+                report.write(f"{stat}\n")
+
+        with open(f"{base_path}.txt", "w") as file:
+            file.write(report.getvalue())
+            file.close()
+        # Pilhas no formato "folded", aceito por ferramentas de flame graph
+        with open(f"{base_path}.folded", "w") as file:
+            for group, samples in threads.items():
+                for stack, count in samples.stacks.items():
+                    file.write(f"{group};{stack} {count}\n")
+            file.close()
+        return f"{base_path}.txt"
+
+    def _sample_loop(self) -> None:
+        own_ident = threading.get_ident()
+        while not self.stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, frame in frames.items():
+                    if ident == own_ident:
+                        continue
+                    group = self._thread_group(names.get(ident, "desconhecida"))
+                    self._record_sample(self.threads.setdefault(group, ThreadSamples()), frame)
+
+    def _record_sample(self, samples: ThreadSamples, frame) -> None:
+        stack: List[FunctionKey] = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        samples.samples += 1
+        samples.self_counts[stack[0]] += 1
+        # Funções recursivas contam uma única vez por amostra no total
+        samples.total_counts.update(set(stack))
+        samples.stacks[";".join(function[2] for function in reversed(stack))] += 1
+
+    def _thread_group(self, thread_name: str) -> str:
+        # Agrupa threads de vida curta do mesmo tipo, ex.: "Thread-N (_handle_message)"
+        return re.sub(r"\d+", "N", thread_name)
+
+    def _format_function(self, function: FunctionKey) -> str:
+        file_name, line, name = function
+        return f"{name} ({os.path.relpath(file_name)}:{line})"
+
+
+manage_profiler = ManageProfiler()